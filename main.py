@@ -2,20 +2,22 @@ import os
 import re
 import sys
 import bisect
-from queue import PriorityQueue
+import heapq
 from typing import (
+    Dict,
     List,
+    Optional,
     Tuple,
     Callable,
 )
 from PySide6.QtCore import (
-    Qt, QObject,
+    Qt, QObject, QIODevice, QSaveFile,
     QFileSystemWatcher, Signal, QRegularExpression,
 )
 from PySide6.QtGui import (
     QFont, QIcon, QColor, QKeySequence,
     QTextCharFormat, QAction, QShortcut,
-    QSyntaxHighlighter,
+    QSyntaxHighlighter, QTextCursor,
 )
 from PySide6.QtWidgets import (
     QMenu, QWidget, QFileDialog, QHeaderView,
@@ -27,6 +29,8 @@ from PySide6.QtWidgets import (
 
 
 class LexerError:
+    __slots__ = ('line', 'column', 'message')
+
     def __init__(self, line: int, column: int, message: str):
         self.line = line
         self.column = column
@@ -37,6 +41,8 @@ class LexerError:
 
 
 class Lexeme:
+    __slots__ = ('type', 'value', 'line', 'column')
+
     def __init__(self, type: str, value: str, line: int, column: int):
         self.type = type
         self.value = value
@@ -48,50 +54,72 @@ class Lexeme:
 
 
 class Branch:
-    def __init__(self, tokens: List[Lexeme], index: int, current_state: str, edit_count: int, changes: List[tuple]
+    __slots__ = (
+        'tokens', 'index', 'source_index', 'current_state', 'edit_count',
+        'changes', 'last_token'
+    )
+
+    def __init__(self, tokens: Tuple[Lexeme, ...], index: int, source_index: int, current_state: str, edit_count: int, changes: Optional[tuple], last_token: Optional[Lexeme] = None
                  ):
         self.tokens = tokens
         self.index = index
+        self.source_index = source_index
         self.current_state = current_state
         self.edit_count = edit_count
         self.changes = changes
+        self.last_token = last_token
 
     def __lt__(self, other):
         return self.edit_count < other.edit_count
 
 
 class Output:
-    TOKEN_REGEX = [
-        (r'\bconst\b', 'CONST'),
-        (r'\bconstexpr\b', 'CONSTEXPR'),
-        (r'\bint\b', 'INT'),
-        (r'=', 'EQUAL'),
-        (r'\+', 'PLUS'),
-        (r'-', 'MINUS'),
-        (r';', 'SEMICOLON'),
-        (r'[a-zA-Z][a-zA-Z0-9]*', 'VARIABLE'),
-        (r'\d+', 'VALUE'),
-        (r'[^\s]', 'INVALID'),
-    ]
+    WHITESPACE_REGEX = re.compile(r'\s+')
+    NEWLINE_REGEX = re.compile('\n')
+    TOKEN_REGEX = re.compile('|'.join(
+        f'(?P<{token_type}>{pattern})'
+        for pattern, token_type in (
+            (r'\bconst\b', 'CONST'),
+            (r'\bconstexpr\b', 'CONSTEXPR'),
+            (r'\bint\b', 'INT'),
+            (r'=', 'EQUAL'),
+            (r'\+', 'PLUS'),
+            (r'-', 'MINUS'),
+            (r';', 'SEMICOLON'),
+            (r'[a-zA-Z][a-zA-Z0-9]*', 'VARIABLE'),
+            (r'\d+', 'VALUE'),
+            (r'[^\s]', 'INVALID'),
+        )
+    ), re.ASCII)
 
     def __init__(self, input_text: str):
         self.input_text = input_text
         self.newline_positions = [
-            i for i, c in enumerate(input_text) if c == '\n'
+            match.start()
+            for match in self.NEWLINE_REGEX.finditer(input_text)
         ]
         self.tokens = []
         self.errors = []
         self.pos = 0
         self.length = len(input_text)
+        self._line_index = 0
 
     def get_line_column(
         self,
         pos: int
     ) -> Tuple[int, int]:
-        line_num = bisect.bisect_right(
-            self.newline_positions,
-            pos
-        ) + 1
+        newline_positions = self.newline_positions
+        line_index = self._line_index
+        if line_index and newline_positions[line_index-1] > pos:
+            line_index = bisect.bisect_right(newline_positions, pos)
+        else:
+            while (
+                line_index < len(newline_positions)
+                and newline_positions[line_index] <= pos
+            ):
+                line_index += 1
+        self._line_index = line_index
+        line_num = line_index + 1
         if line_num > 1:
             column = pos - self.newline_positions[line_num-2]
         else:
@@ -100,40 +128,25 @@ class Output:
 
     def tokenize(self) -> Tuple[List[Lexeme], List[LexerError]]:
         while self.pos < self.length:
-            while (
-                self.pos < self.length
-                and self.input_text[self.pos].isspace()
-            ):
-                self.pos += 1
+            match = self.WHITESPACE_REGEX.match(self.input_text, self.pos)
+            if match:
+                self.pos = match.end()
             if self.pos >= self.length:
                 break
 
             line, column = self.get_line_column(self.pos)
-            matched = False
-            for pattern, token_type in self.TOKEN_REGEX:
-                regex = re.compile(pattern)
-                match = regex.match(self.input_text, self.pos)
-                if match:
-                    value = match.group(0)
-                    if token_type in ('CONST', 'CONSTEXPR', 'INT'):
-                        next_pos = match.end()
-                        if (
-                            next_pos < self.length
-                            and self.input_text[next_pos].isalnum()
-                        ):
-                            continue
-                    self.tokens.append(
-                        Lexeme(
-                            token_type,
-                            value,
-                            line,
-                            column
-                        )
+            match = self.TOKEN_REGEX.match(self.input_text, self.pos)
+            if match:
+                self.tokens.append(
+                    Lexeme(
+                        match.lastgroup,
+                        match.group(0),
+                        line,
+                        column
                     )
-                    self.pos = match.end()
-                    matched = True
-                    break
-            if not matched:
+                )
+                self.pos = match.end()
+            else:
                 char = self.input_text[self.pos]
                 self.errors.append(
                     LexerError(
@@ -148,19 +161,24 @@ class Output:
 
 class Lexer:
     MAX_EDIT_COUNT = 15
-
-    REGULAR_LEXEME = [
-        (r'const\b', 'CONST'),
-        (r'constexpr\b', 'CONSTEXPR'),
-        (r'int\b', 'INT'),
-        (r'=', 'EQUAL'),
-        (r'\+', 'PLUS'),
-        (r'-', 'MINUS'),
-        (r';', 'SEMICOLON'),
-        (r'[a-zA-Z_][^ \t\n\r:;=+]*', 'VARIABLE'),
-        (r'\d[^ \t\n\r:;=+]*', 'VALUE'),
-        (r'[^\s]', 'INVALID'),
-    ]
+    WHITESPACE_REGEX = re.compile(r'\s+')
+    NEWLINE_REGEX = re.compile('\n')
+
+    REGULAR_LEXEME = re.compile('|'.join(
+        f'(?P<{token_type}>{pattern})'
+        for pattern, token_type in (
+            (r'const\b', 'CONST'),
+            (r'constexpr\b', 'CONSTEXPR'),
+            (r'int\b', 'INT'),
+            (r'=', 'EQUAL'),
+            (r'\+', 'PLUS'),
+            (r'-', 'MINUS'),
+            (r';', 'SEMICOLON'),
+            (r'[a-zA-Z_][^ \t\n\r:;=+]*', 'VARIABLE'),
+            (r'\d[^ \t\n\r:;=+]*', 'VALUE'),
+            (r'[^\s]', 'INVALID'),
+        )
+    ))
 
     DEFAULT_LEXEME_VALUES = {
         'CONST': 'const', 'CONSTEXPR': 'constexpr', 'INT': 'int',
@@ -184,22 +202,38 @@ class Lexer:
         'END': {}
     }
 
-    KEYWORDS = {'const', 'constexpr', 'int'}
+    KEYWORDS = frozenset({'const', 'constexpr', 'int'})
     KEYWORD_TO_TOKEN = {'const': 'CONST',
                         'constexpr': 'CONSTEXPR', 'int': 'INT'}
     KEYWORD_TOLERANCE = 2
+    KEYWORD_LENGTHS = tuple(
+        (keyword, len(keyword)) for keyword in sorted(KEYWORDS)
+    )
+    MAX_KEYWORD_LENGTH = max(length for _, length in KEYWORD_LENGTHS)
 
     def __init__(self, input_text: str):
         self.input_text = input_text
         self.newline_positions = [
-            i for i, c in enumerate(input_text) if c == '\n']
+            match.start()
+            for match in self.NEWLINE_REGEX.finditer(input_text)
+        ]
         self.tokens = []
         self.errors = []
         self.pos = 0
         self.length = len(input_text)
+        self._line_index = 0
 
     def get_line_column(self, pos: int) -> Tuple[int, int]:
-        line_num = bisect.bisect_right(self.newline_positions, pos) + 1
+        newline_positions = self.newline_positions
+        line_index = self._line_index
+        if line_index and newline_positions[line_index - 1] > pos:
+            line_index = bisect.bisect_right(newline_positions, pos)
+        else:
+            while (line_index < len(newline_positions)
+                   and newline_positions[line_index] <= pos):
+                line_index += 1
+        self._line_index = line_index
+        line_num = line_index + 1
         if line_num > 1:
             column = pos - self.newline_positions[line_num - 2]
         else:
@@ -215,129 +249,130 @@ class Lexer:
             return Lexeme(token_type, value, reference_token.line, reference_token.column)
 
     def _is_keyword_candidate(self, value: str) -> bool:
-        value_lower = value.lower()
-        for keyword in self.KEYWORDS:
-            if len(value) < len(keyword) - self.KEYWORD_TOLERANCE:
-                continue
-            if self._fuzzy_match(value_lower, keyword):
-                return True
-        return False
-
-    def _fuzzy_match(self, s: str, target: str) -> bool:
-        if not s or not target:
-            return False
-        if s[0] != target[0]:
-            return False
-        max_length = max(len(s), len(target))
-        matches = 0
-        s_idx, t_idx = 0, 0
-        while s_idx < len(s) and t_idx < len(target):
-            if s[s_idx] == target[t_idx]:
-                matches += 1
-                s_idx += 1
-                t_idx += 1
-            else:
-                t_idx += 1
-        return matches / len(target) >= 0.6
+        return bool(self._correct_keyword(value))
+
+    @staticmethod
+    def _bounded_levenshtein(s: str, target: str, max_distance: int) -> int:
+        if abs(len(s) - len(target)) > max_distance:
+            return max_distance + 1
+        previous = list(range(len(target) + 1))
+        current = [0] * (len(target) + 1)
+        for i, s_char in enumerate(s, 1):
+            current[0] = i
+            row_min = i
+            for j, t_char in enumerate(target, 1):
+                cost = previous[j - 1] + (s_char != t_char)
+                if previous[j] + 1 < cost:
+                    cost = previous[j] + 1
+                if current[j - 1] + 1 < cost:
+                    cost = current[j - 1] + 1
+                current[j] = cost
+                if cost < row_min:
+                    row_min = cost
+            if row_min > max_distance:
+                return max_distance + 1
+            previous, current = current, previous
+        return min(previous[-1], max_distance + 1)
 
     def _correct_keyword(self, value: str) -> str:
+        if len(value) > self.MAX_KEYWORD_LENGTH + self.KEYWORD_TOLERANCE:
+            return ""
         value_lower = value.lower()
-        for keyword in self.KEYWORDS:
-            if self._fuzzy_match(value_lower, keyword):
+        value_length = len(value_lower)
+        for keyword, length in self.KEYWORD_LENGTHS:
+            if abs(value_length - length) > self.KEYWORD_TOLERANCE:
+                continue
+            if self._bounded_levenshtein(
+                value_lower,
+                keyword,
+                self.KEYWORD_TOLERANCE
+            ) <= self.KEYWORD_TOLERANCE:
                 return keyword
         return ""
 
     def strtok(self) -> Tuple[List[Lexeme], List[LexerError]]:
         while self.pos < self.length:
-            while self.pos < self.length and self.input_text[self.pos].isspace():
-                self.pos += 1
+            match = self.WHITESPACE_REGEX.match(self.input_text, self.pos)
+            if match:
+                self.pos = match.end()
             if self.pos >= self.length:
                 break
 
             line, column = self.get_line_column(self.pos)
-            matched = False
-
-            for pattern, token_type in self.REGULAR_LEXEME:
-                regex = re.compile(pattern)
-                match = regex.match(self.input_text, self.pos)
-                if match:
-                    value = match.group(0)
-                    self.pos = match.end()
+            match = self.REGULAR_LEXEME.match(self.input_text, self.pos)
+            if match:
+                token_type = match.lastgroup
+                value = match.group(0)
+                self.pos = match.end()
+
+                if token_type == 'IDENTIFIER':
+                    original = value
+                    valid_chars = []
+                    has_errors = False
+
+                    if not (original[0].isalpha() or original[0] == '_'):
+                        self.errors.append(LexerError(
+                            line, column,
+                            f"Символ идентификатора {
+                                original[0]} не должен быть первым"
+                        ))
+                        has_errors = True
+                    else:
+                        valid_chars.append(original[0])
 
-                    if token_type == 'IDENTIFIER':
-                        original = value
-                        valid_chars = []
-                        has_errors = False
+                    for i in range(1, len(original)):
+                        c = original[i]
+                        if c.isalnum() or c == '_':
+                            valid_chars.append(c)
+                        else:
+                            has_errors = True
 
-                        if not (original[0].isalpha() or original[0] == '_'):
+                    valid_value = ''.join(valid_chars) or '_'
+                    if valid_value in self.KEYWORDS:
+                        keyword_token_type = self.KEYWORD_TO_TOKEN[valid_value]
+                        self.tokens.append(
+                            Lexeme(keyword_token_type, valid_value, line, column))
+                        if has_errors:
                             self.errors.append(LexerError(
                                 line, column,
-                                f"Символ идентификатора {
-                                    original[0]} не должен быть первым"
+                                f"Замените '{original}' на '{
+                                    valid_value}'"
                             ))
-                            has_errors = True
-                        else:
-                            valid_chars.append(original[0])
-
-                        for i in range(1, len(original)):
-                            c = original[i]
-                            if c.isalnum() or c == '_':
-                                valid_chars.append(c)
-                            else:
-                                has_errors = True
-
-                        valid_value = ''.join(valid_chars) or '_'
-                        if valid_value in self.KEYWORDS:
-                            keyword_token_type = self.KEYWORD_TO_TOKEN[valid_value]
-                            self.tokens.append(
-                                Lexeme(keyword_token_type, valid_value, line, column))
-                            if has_errors:
-                                self.errors.append(LexerError(
-                                    line, column,
-                                    f"Замените '{original}' на '{
-                                        valid_value}'"
-                                ))
-                        else:
-                            self.tokens.append(
-                                Lexeme('IDENTIFIER', valid_value, line, column))
-                            if has_errors:
-                                self.errors.append(LexerError(
-                                    line, column,
-                                    f"Замените имя переменной: '{
-                                        original}' -> '{valid_value}'"
-                                ))
-                        matched = True
-                        break
-
-                    elif token_type == 'NUMBER':
-                        original = value
-                        cleaned = []
-                        has_errors = False
-                        for i, c in enumerate(original):
-                            if c.isdigit():
-                                cleaned.append(c)
-                            else:
-                                has_errors = True
-
-                        valid_value = ''.join(cleaned) or '0'
+                    else:
                         self.tokens.append(
-                            Lexeme('NUMBER', valid_value, line, column))
+                            Lexeme('IDENTIFIER', valid_value, line, column))
                         if has_errors:
                             self.errors.append(LexerError(
                                 line, column,
-                                f"Замените число: '{
+                                f"Замените имя переменной: '{
                                     original}' -> '{valid_value}'"
                             ))
-                        matched = True
-                        break
 
-                    else:
-                        self.tokens.append(
-                            Lexeme(token_type, value, line, column))
-                        matched = True
-                        break
+                elif token_type == 'NUMBER':
+                    original = value
+                    cleaned = []
+                    has_errors = False
+                    for i, c in enumerate(original):
+                        if c.isdigit():
+                            cleaned.append(c)
+                        else:
+                            has_errors = True
+
+                    valid_value = ''.join(cleaned) or '0'
+                    self.tokens.append(
+                        Lexeme('NUMBER', valid_value, line, column))
+                    if has_errors:
+                        self.errors.append(LexerError(
+                            line, column,
+                            f"Замените число: '{
+                                original}' -> '{valid_value}'"
+                        ))
+
+                else:
+                    self.tokens.append(
+                        Lexeme(token_type, value, line, column))
 
-            if not matched:
+            else:
                 char = self.input_text[self.pos]
                 self.errors.append(LexerError(
                     line, column, f"Невалидный символ: {repr(char)}"))
@@ -346,22 +381,32 @@ class Lexer:
         return self.tokens, self.errors
 
     def validate_tokens(self) -> Tuple[List[Lexeme], List[LexerError]]:
-        queue = PriorityQueue()
-        queue.put((
+        queue = []
+        heapq.heappush(queue, (
             0,
             Branch(
-                self.tokens.copy(), 0, 'START', 0, []
+                tuple(self.tokens), 0, 0, 'START', 0, None
             )
         ))
         best = None
+        best_seen = {}
 
-        while not queue.empty():
-            _, branch = queue.get()
+        while queue:
+            _, branch = heapq.heappop(queue)
 
             if best and best.edit_count <= self.MAX_EDIT_COUNT:
                 break
 
-            if branch.index >= len(branch.tokens):
+            key = (branch.current_state, branch.source_index)
+            seen_edit_count = best_seen.get(key)
+            if (
+                seen_edit_count is not None
+                and seen_edit_count <= branch.edit_count
+            ):
+                continue
+            best_seen[key] = branch.edit_count
+
+            if branch.source_index >= len(branch.tokens):
                 if branch.current_state in ('END', 'START'):
                     if not best or branch.edit_count < best.edit_count:
                         best = branch
@@ -371,7 +416,7 @@ class Lexer:
                         branch
                     )
             else:
-                current_token = branch.tokens[branch.index]
+                current_token = branch.tokens[branch.source_index]
                 allowed = self.TRANSITIONS.get(
                     branch.current_state,
                     {}
@@ -399,10 +444,10 @@ class Lexer:
             {}
         ).keys()
 
+        last_token = branch.last_token
         for insert_type in allowed:
             line, column = 1, 1
-            if branch.tokens:
-                last_token = branch.tokens[-1]
+            if last_token:
                 line = last_token.line
                 column = last_token.column + len(last_token.value)
 
@@ -415,27 +460,29 @@ class Lexer:
                 line,
                 column
             )
-            new_tokens = branch.tokens.copy()
-            new_tokens.append(insert_token)
-            new_changes = branch.changes.copy()
-            new_changes.append(('insert', len(new_tokens)-1, insert_token))
+            new_changes = (
+                branch.changes,
+                ('insert', branch.index, insert_token)
+            )
             next_state = self.TRANSITIONS[current_state][insert_type]
 
             if branch.edit_count + 1 <= self.MAX_EDIT_COUNT:
                 new_branch = Branch(
-                    tokens=new_tokens,
-                    index=len(new_tokens),
+                    tokens=branch.tokens,
+                    index=branch.index + 1,
+                    source_index=branch.source_index,
                     current_state=next_state,
                     edit_count=branch.edit_count + 1,
-                    changes=new_changes
+                    changes=new_changes,
+                    last_token=insert_token
                 )
-                queue.put((
+                heapq.heappush(queue, (
                     new_branch.edit_count,
                     new_branch
                 ))
 
     def _handle_valid_transition(self, queue, branch):
-        current_token = branch.tokens[branch.index]
+        current_token = branch.tokens[branch.source_index]
         next_state = self.TRANSITIONS[branch.current_state][current_token.type]
 
         new_edit_count = branch.edit_count if next_state != 'END' else 0
@@ -444,11 +491,16 @@ class Lexer:
         new_branch = Branch(
             tokens=branch.tokens,
             index=branch.index + 1,
+            source_index=branch.source_index + 1,
             current_state=new_state,
             edit_count=new_edit_count,
-            changes=branch.changes.copy()
+            changes=branch.changes,
+            last_token=current_token
         )
-        queue.put((new_branch.edit_count, new_branch))
+        heapq.heappush(queue, (
+            new_branch.edit_count,
+            new_branch
+        ))
 
     def _generate_repair_branches(
         self,
@@ -462,23 +514,21 @@ class Lexer:
         self._generate_insert_branches(queue, branch, current_token, allowed)
 
     def _generate_delete_branch(self, queue, branch, current_token):
-        new_tokens = branch.tokens.copy()
-        del new_tokens[branch.index]
-        new_changes = branch.changes.copy()
-        new_changes.append((
-            'delete',
-            branch.index,
-            current_token
-        ))
+        new_changes = (
+            branch.changes,
+            ('delete', branch.index, current_token)
+        )
         if branch.edit_count + 1 <= self.MAX_EDIT_COUNT:
             new_branch = Branch(
-                tokens=new_tokens,
+                tokens=branch.tokens,
                 index=branch.index,
+                source_index=branch.source_index + 1,
                 current_state=branch.current_state,
                 edit_count=branch.edit_count + 1,
-                changes=new_changes
+                changes=new_changes,
+                last_token=branch.last_token
             )
-            queue.put((
+            heapq.heappush(queue, (
                 new_branch.edit_count,
                 new_branch
             ))
@@ -493,25 +543,22 @@ class Lexer:
         current_state = branch.current_state
         for replace_type in allowed:
             new_token = self.create_token(replace_type, current_token)
-            new_tokens = branch.tokens.copy()
-            new_tokens[branch.index] = new_token
-            new_changes = branch.changes.copy()
-            new_changes.append((
-                'replace',
-                branch.index,
-                current_token,
-                new_token
-            ))
+            new_changes = (
+                branch.changes,
+                ('replace', branch.index, current_token, new_token)
+            )
             next_state = self.TRANSITIONS[current_state][replace_type]
             if branch.edit_count + 1 <= self.MAX_EDIT_COUNT:
                 new_branch = Branch(
-                    tokens=new_tokens,
+                    tokens=branch.tokens,
                     index=branch.index + 1,
+                    source_index=branch.source_index + 1,
                     current_state=next_state,
                     edit_count=branch.edit_count + 1,
-                    changes=new_changes
+                    changes=new_changes,
+                    last_token=new_token
                 )
-                queue.put((
+                heapq.heappush(queue, (
                     new_branch.edit_count,
                     new_branch
                 ))
@@ -530,28 +577,64 @@ class Lexer:
                 current_token,
                 False
             )
-            new_tokens = branch.tokens.copy()
-            new_tokens.insert(branch.index, insert_token)
-            new_changes = branch.changes.copy()
-            new_changes.append(('insert', branch.index, insert_token))
+            new_changes = (
+                branch.changes,
+                ('insert', branch.index, insert_token)
+            )
             next_state = self.TRANSITIONS[current_state][insert_type]
             if branch.edit_count + 1 <= self.MAX_EDIT_COUNT:
                 new_branch = Branch(
-                    tokens=new_tokens,
+                    tokens=branch.tokens,
                     index=branch.index + 1,
+                    source_index=branch.source_index,
                     current_state=next_state,
                     edit_count=branch.edit_count + 1,
-                    changes=new_changes
+                    changes=new_changes,
+                    last_token=insert_token
                 )
-                queue.put((new_branch.edit_count, new_branch))
+                heapq.heappush(queue, (
+                    new_branch.edit_count,
+                    new_branch
+                ))
 
     def _finalize_validation(self, best):
         if best:
-            self.tokens = best.tokens
-            errors = self._generate_errors_from_changes(best.changes)
+            changes = self._collect_changes(best.changes)
+            self.tokens = self._apply_changes(best.tokens, changes)
+            errors = self._generate_errors_from_changes(changes)
             return self.tokens, errors
         return self.tokens, self.errors + []
 
+    @staticmethod
+    def _apply_changes(
+        tokens: Tuple[Lexeme, ...],
+        changes: List[tuple]
+    ) -> List[Lexeme]:
+        result = []
+        source_index = 0
+        for action, index, *change_tokens in changes:
+            copied = index - len(result)
+            result.extend(tokens[source_index:source_index + copied])
+            source_index += copied
+            if action == 'delete':
+                source_index += 1
+            elif action == 'replace':
+                result.append(change_tokens[1])
+                source_index += 1
+            elif action == 'insert':
+                result.append(change_tokens[0])
+        result.extend(tokens[source_index:])
+        return result
+
+    @staticmethod
+    def _collect_changes(node: Optional[tuple]) -> List[tuple]:
+        changes = []
+        while node:
+            node, change = node
+            changes.append(change)
+        changes.reverse()
+        return changes
+
     def _generate_errors_from_changes(
         self,
         changes: List[tuple]
@@ -591,41 +674,67 @@ class Lexer:
 
 
 class SyntaxHighlighter(QSyntaxHighlighter):
+    RULES = (
+        (("const", "constexpr"), QColor(207, 106, 76)),
+        (("int",), QColor(103, 140, 177)),
+    )
+    _pattern = None
+    _word_formats = None
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.rules = []
-        self._init_highlight_rules()
-
-    def _init_highlight_rules(self):
-        self._add_rule(["const", "constexpr"], QColor(207, 106, 76),)
-        self._add_rule(["int"], QColor(103, 140, 177),)
-
-    def _add_rule(self, keywords, color, bold=False, italic=False):
+        self.word_formats = self._get_word_formats()
+        self.pattern = self._get_pattern()
+
+    @classmethod
+    def _get_word_formats(cls):
+        if cls._word_formats is None:
+            cls._word_formats = {}
+            for keywords, color in cls.RULES:
+                fmt = cls._create_format(color)
+                for word in keywords:
+                    cls._word_formats[word] = fmt
+        return cls._word_formats
+
+    @staticmethod
+    def _create_format(color, bold=False, italic=False):
         fmt = QTextCharFormat()
         fmt.setForeground(color)
         fmt.setFontWeight(QFont.Weight.Bold if bold else QFont.Weight.Normal)
         fmt.setFontItalic(italic)
-
-        for word in keywords:
-            pattern = QRegularExpression(
-                r"\b" + QRegularExpression.escape(word) + r"\b")
-            if pattern.isValid():
-                self.rules.append((pattern, fmt))
+        return fmt
+
+    @classmethod
+    def _get_pattern(cls):
+        if cls._pattern is None:
+            words = "|".join(
+                QRegularExpression.escape(word)
+                for keywords, _ in cls.RULES
+                for word in keywords
+            )
+            cls._pattern = QRegularExpression(r"\b(?:" + words + r")\b")
+            cls._pattern.optimize()
+        return cls._pattern
 
     def highlightBlock(self, text):
-        for pattern, fmt in self.rules:
-            match_iterator = pattern.globalMatch(text)
-            while match_iterator.hasNext():
-                match = match_iterator.next()
-                self.setFormat(
-                    match.capturedStart(),
-                    match.capturedLength(),
-                    fmt
-                )
         self.setCurrentBlockState(0)
+        if not text or text.isspace():
+            return
+        set_format = self.setFormat
+        word_formats = self.word_formats
+        match_iterator = self.pattern.globalMatch(text)
+        while match_iterator.hasNext():
+            match = match_iterator.next()
+            set_format(
+                match.capturedStart(),
+                match.capturedLength(),
+                word_formats[match.captured()]
+            )
 
 
 class TextEditor(QPlainTextEdit):
+    HIGHLIGHT_LIMIT = 1_000_000
+
     def __init__(self):
         super().__init__()
         self.current_line_format = QTextCharFormat()
@@ -636,6 +745,59 @@ class TextEditor(QPlainTextEdit):
         self.setFont(QFont("Fira Code", 12))
         self.highlighter = SyntaxHighlighter(self.document())
 
+    def setPlainText(self, text):
+        self.highlighter.setDocument(None)
+        super().setPlainText(text)
+        if len(text) <= self.HIGHLIGHT_LIMIT:
+            self.highlighter.setDocument(self.document())
+
+    def replace_text(self, text):
+        current = self.toPlainText()
+        if current == text:
+            return
+        highlighted = self.highlighter.document() is not None
+        if highlighted != (len(text) <= self.HIGHLIGHT_LIMIT):
+            self.setPlainText(text)
+            return
+
+        prefix = self._common_prefix_length(current, text)
+        suffix = self._common_suffix_length(current[prefix:], text[prefix:])
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        cursor.setPosition(self._utf16_length(current[:prefix]))
+        cursor.setPosition(
+            self._utf16_length(current[:len(current) - suffix]),
+            QTextCursor.MoveMode.KeepAnchor
+        )
+        cursor.insertText(text[prefix:len(text) - suffix])
+        cursor.endEditBlock()
+
+    @staticmethod
+    def _common_prefix_length(a, b):
+        low, high = 0, min(len(a), len(b))
+        while low < high:
+            mid = (low + high + 1) // 2
+            if a[:mid] == b[:mid]:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    @staticmethod
+    def _common_suffix_length(a, b):
+        low, high = 0, min(len(a), len(b))
+        while low < high:
+            mid = (low + high + 1) // 2
+            if a[len(a) - mid:] == b[len(b) - mid:]:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    @staticmethod
+    def _utf16_length(text):
+        return len(text.encode("utf-16-le", "surrogatepass")) // 2
+
     def setup_connections(self):
         self.blockCountChanged.connect(self._update_line_number_width)
         self.cursorPositionChanged.connect(self._highlight_current_line)
@@ -699,6 +861,8 @@ class DocumentModel(QObject):
             raise TypeError(
                 "Путь должен быть строкой или None"
             )
+        if value == self._file_path:
+            return
         old_value = self._file_path
         self._file_path = value
         self.file_path_changed.emit(str(old_value), str(value))
@@ -716,11 +880,15 @@ class DocumentModel(QObject):
             raise TypeError(
                 "Флаг изменения должен быть логическим значением"
             )
+        if value == self._is_modified:
+            return
         self._is_modified = value
         self.modified.emit(value)
 
 
 class DocumentWidget(QWidget):
+    WRITE_CHUNK_SIZE = 1 << 16
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._is_connected = False
@@ -732,7 +900,7 @@ class DocumentWidget(QWidget):
         self.main_layout = QVBoxLayout(self)
 
         self.input_edit = TextEditor()
-        self.highlighter = SyntaxHighlighter(self.input_edit.document())
+        self.highlighter = self.input_edit.highlighter
         self.output_tabs = QTabWidget()
 
         self.error_table = QTableWidget()
@@ -783,6 +951,7 @@ class DocumentWidget(QWidget):
         self.model.file_path_changed.connect(self._update_file_watcher)
 
     def save(self, path):
+        was_watched = False
         try:
             if not path:
                 raise ValueError(
@@ -794,17 +963,27 @@ class DocumentWidget(QWidget):
                 self.file_watcher.fileChanged.disconnect()
                 self._is_connected = False
 
-            with open(
-                path,
-                "w",
-                encoding="utf-8"
-            ) as f:
-                content = self.input_edit.toPlainText()
-                if not isinstance(content, str):
-                    raise TypeError(
-                        "Содержимое должно быть строкой"
-                    )
-                f.write(content)
+            content = self.input_edit.toPlainText()
+            if not isinstance(content, str):
+                raise TypeError(
+                    "Содержимое должно быть строкой"
+                )
+            was_watched = path in self.file_watcher.files()
+            if was_watched:
+                self.file_watcher.removePath(path)
+
+            save_file = QSaveFile(path)
+            if not save_file.open(
+                QIODevice.OpenModeFlag.WriteOnly
+                | QIODevice.OpenModeFlag.Text
+            ):
+                raise OSError(save_file.errorString())
+            for start in range(0, len(content), self.WRITE_CHUNK_SIZE):
+                save_file.write(
+                    content[start:start + self.WRITE_CHUNK_SIZE].encode("utf-8")
+                )
+            if not save_file.commit():
+                raise OSError(save_file.errorString())
 
             self.model.is_modified = False
             self.last_saved_mtime = os.path.getmtime(path)
@@ -819,6 +998,8 @@ class DocumentWidget(QWidget):
             )
             return False
         finally:
+            if was_watched and path not in self.file_watcher.files():
+                self.file_watcher.addPath(path)
             if not self._is_connected:
                 self.file_watcher.fileChanged.connect(
                     self._handle_file_changed
@@ -881,19 +1062,48 @@ class DocumentWidget(QWidget):
             return
 
         try:
-            with open(self.model.file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+            content = self.read_file(self.model.file_path)
             self.input_edit.blockSignals(True)
-            self.input_edit.setPlainText(content)
+            self.input_edit.replace_text(content)
             self.input_edit.blockSignals(False)
             self.model.is_modified = False
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки: {str(e)}")
 
     def _handle_text_changed(self):
+        if self._is_reloading:
+            return
         if not self.model.is_modified:
             self.model.is_modified = True
 
+    def set_text(self, content):
+        self._is_reloading = True
+        try:
+            self.input_edit.setPlainText(content)
+        finally:
+            self._is_reloading = False
+
+    @staticmethod
+    def read_file(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        content = data.decode("utf-8")
+        if "\r" in content:
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+        return content
+
+
+class IconCache:
+    _icons: Dict[str, QIcon] = {}
+
+    @classmethod
+    def get(cls, icon_name: str) -> QIcon:
+        icon = cls._icons.get(icon_name)
+        if icon is None:
+            icon = QIcon.fromTheme(icon_name)
+            cls._icons[icon_name] = icon
+        return icon
+
 
 class ToolbarManager:
     def __init__(self, parent: QMainWindow) -> None:
@@ -902,7 +1112,7 @@ class ToolbarManager:
         parent.addToolBar(self.toolbar)
 
     def add_action(self, icon_name: str, text: str, callback: Callable) -> QAction:
-        action = QAction(QIcon.fromTheme(icon_name), text, self.parent)
+        action = QAction(IconCache.get(icon_name), text, self.parent)
         action.triggered.connect(callback)
         self.toolbar.addAction(action)
         return action
@@ -1031,14 +1241,16 @@ class MenuManager:
         self._add_menu_actions(menu, actions)
 
     def _add_menu_actions(self, menu: QMenu, actions: list) -> None:
+        menu_actions = []
         for text, icon_name, callback in actions:
             action = QAction(
-                QIcon.fromTheme(icon_name),
+                IconCache.get(icon_name),
                 text,
                 self.parent
             )
             action.triggered.connect(callback)
-            menu.addAction(action)
+            menu_actions.append(action)
+        menu.addActions(menu_actions)
 
 
 class MainView(QMainWindow):
@@ -1053,6 +1265,7 @@ class MainView(QMainWindow):
         self._setup_toolbar()
         self._setup_shortcuts()
         self._setup_font_size()
+        self._last_analyzed_text = None
 
     def _setup_toolbar(self):
         actions = [
@@ -1087,12 +1300,12 @@ class MainView(QMainWindow):
 
     def _setup_font_size(self):
         self.font_size = 12
+        self._font = QFont()
         self.update_font_size()
 
     def update_font_size(self):
-        font = QFont()
-        font.setPointSize(self.font_size)
-        self.doc_widget.input_edit.setFont(font)
+        self._font.setPointSize(self.font_size)
+        self.doc_widget.input_edit.setFont(self._font)
 
     def increase_font_size(self):
         self.font_size += 1
@@ -1105,7 +1318,7 @@ class MainView(QMainWindow):
 
     def new_document(self):
         self.doc_widget.model.file_path = None
-        self.doc_widget.input_edit.clear()
+        self.doc_widget.set_text("")
         self.doc_widget.model.is_modified = False
 
     def open_document(self):
@@ -1113,9 +1326,8 @@ class MainView(QMainWindow):
             self, "Открыть файл", "", "Текстовые файлы (*.txt);;Все файлы (*)")
         if path:
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                self.doc_widget.input_edit.setPlainText(content)
+                content = DocumentWidget.read_file(path)
+                self.doc_widget.set_text(content)
                 self.doc_widget.model.file_path = path
                 self.doc_widget.model.is_modified = False
             except Exception as e:
@@ -1144,15 +1356,18 @@ class MainView(QMainWindow):
     def run_analizer(self):
         doc = self.doc_widget
         input_text = doc.input_edit.toPlainText()
+        if input_text == self._last_analyzed_text:
+            return
+        self._last_analyzed_text = input_text
         output = Output(input_text)
         lexeme, _ = output.tokenize()
         lexer = Lexer(input_text)
         _, lexer_errors = lexer.strtok()
-        valid_tokens, validation_errors = lexer.validate_tokens()
+        _, validation_errors = lexer.validate_tokens()
         all_errors = lexer_errors + validation_errors
 
         doc.token_table.setRowCount(0)
-        doc.token_table.setRowCount(len(valid_tokens))
+        doc.token_table.setRowCount(len(lexeme))
 
         for row, token in enumerate(lexeme):
             line = token.line
@@ -1189,31 +1404,6 @@ class MainView(QMainWindow):
                 row, 1, QTableWidgetItem(str(error.column)))
             doc.error_table.setItem(row, 2, QTableWidgetItem(error.message))
 
-        input_text = self.doc_widget.input_edit.toPlainText()
-        output = Output(input_text)
-        lex, _ = output.tokenize()
-        lexer = Lexer(input_text)
-        _, _ = lexer.strtok()
-
-        self.doc_widget.token_table.setRowCount(0)
-        self.doc_widget.token_table.setRowCount(len(lex))
-
-        for row, token in enumerate(lex):
-            line = token.line
-            start = token.column
-            end = start + len(token.value) - 1
-
-            self.doc_widget.token_table.setItem(
-                row, 0, QTableWidgetItem(str(line)))
-            self.doc_widget.token_table.setItem(
-                row, 1, QTableWidgetItem(str(start)))
-            self.doc_widget.token_table.setItem(
-                row, 2, QTableWidgetItem(str(end)))
-            self.doc_widget.token_table.setItem(
-                row, 3, QTableWidgetItem(token.type))
-            self.doc_widget.token_table.setItem(
-                row, 4, QTableWidgetItem(token.value))
-
     def undo(self):
         self.doc_widget.input_edit.undo()
 